@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 import argparse
+import itertools
 import logging
 import string
 import sys
 import wordle
 
+VALID_LETTERS = frozenset(string.ascii_lowercase)
 DESCRIPTION = """"""
 
 
@@ -17,6 +19,9 @@ def make_argparser():
   options.add_argument('-s', '--sort', action='store_true',
     help='Sort output by letter frequency instead of alphabetically.')
   options.add_argument('-w', '--weight', type=float, default=1)
+  options.add_argument('--word-length', type=int,
+    help='Only count words of this length. Otherwise, all words are counted, and the table is as '
+      'wide as the longest word.')
   options.add_argument('-h', '--help', action='help',
     help='Print this argument help text and exit.')
   logs = parser.add_argument_group('Logging')
@@ -40,33 +45,37 @@ def main(argv):
   if args.stats:
     stats = wordle.read_word_stats(args.stats)
 
-  # Count up all letter occurrences in all words.
-  freqs = {letter:[0] for letter in string.ascii_lowercase}
+  # Read in all the words and their weights up front, so the counting can go column by column.
+  words = []
+  weights = []
   for fields in wordle.read_tsv(args.words):
     word = fields[0].lower()
-    for place, letter in enumerate(word,1):
-      try:
-        freqs[letter]
-      except KeyError:
-        fail(f'Invalid character {letter!r} in word {word!r}')
-      letter_freqs = freqs[letter]
-      if stats is None or word not in stats:
-        weight = 1
-      else:
-        weight = stats[word]**2
-      letter_freqs[0] += 1 * weight
-      while len(letter_freqs) <= place:
-        letter_freqs.append(0)
-      letter_freqs[place] += 1 * weight
+    if args.word_length is not None and len(word) != args.word_length:
+      continue
+    if not VALID_LETTERS.issuperset(word):
+      invalid = next(letter for letter in word if letter not in VALID_LETTERS)
+      fail(f'Invalid character {invalid!r} in word {word!r}')
+    if stats is None or word not in stats:
+      weight = 1
+    else:
+      weight = stats[word]**2
+    words.append(word)
+    weights.append(weight)
+  if args.word_length is None:
+    max_word_len = max((len(word) for word in words), default=0)
+    logging.info(f'Max word length: {max_word_len}')
+  else:
+    max_word_len = args.word_length
 
-  # Pad out the counts to the full word lengths.
-  max_word_len = 0
-  for counts in freqs.values():
-    max_word_len = max(max_word_len, len(counts))
-  logging.info(f'Max word length: {max_word_len}')
+  # Count up all letter occurrences in all words, one position at a time.
+  # counts[0] is the total for the letter, counts[place] is the count at that (1-based) place.
+  freqs = {letter:[0]*(max_word_len+1) for letter in string.ascii_lowercase}
+  for place, column in enumerate(itertools.zip_longest(*words), 1):
+    for letter, weight in zip(column, weights):
+      if letter is not None:
+        freqs[letter][place] += weight
   for counts in freqs.values():
-    while len(counts) < max_word_len:
-      counts.append(0)
+    counts[0] = sum(counts[1:])
 
   # Define the sorting key according to the desired sort.
   if args.sort:
@@ -74,14 +83,12 @@ def main(argv):
   else:
     key_fxn = lambda item: item[0]
 
-  # Print the results.
-  print('# '+' '.join(argv))
+  # Print the results, all in one write.
+  lines = ['# '+' '.join(argv)]
   for letter, counts in sorted(freqs.items(), key=key_fxn):
-    fields = [letter]
-    for count in counts:
-      weighted_count = round(count*args.weight)
-      fields.append(weighted_count)
-    print(*fields, sep='\t')
+    weighted_counts = [str(round(count*args.weight)) for count in counts]
+    lines.append('\t'.join([letter, *weighted_counts]))
+  sys.stdout.write('\n'.join(lines)+'\n')
 
 
 def fail(message):
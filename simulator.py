@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import argparse
 import collections
+import concurrent.futures
+import functools
 import logging
 import pathlib
 import time
@@ -11,6 +13,8 @@ SCRIPT_DIR = pathlib.Path(__file__).resolve().parent
 DEFAULT_WORDLIST = SCRIPT_DIR/'words.txt'
 DEFAULT_FREQ_LIST = SCRIPT_DIR/'letter-freqs.all-answers.tsv'
 DEFAULT_WORD_STATS = SCRIPT_DIR/'stats-ghent-plus.tsv'
+ABSENT, PRESENT, FIXED = range(3)
+FEEDBACK_CHARS = '.YG'
 DESCRIPTION = """Simulate Wordle games and pit the solver algorithm against it."""
 
 
@@ -37,6 +41,10 @@ def make_argparser():
     help='File containing statistics on words. This should be a tab-delimited file with at least '
       'two columns: the word, and the proportion of people who recognize it (a float from 0 to 1). '
       'Default: '+str(DEFAULT_WORD_STATS))
+  options.add_argument('-P', '--processes', type=int, default=1,
+    help='Simulate the --answers games in this many parallel processes. Each process keeps its own '
+      "cache of the solver's choices, so the speedup is somewhat less than linear. "
+      'Default: %(default)s')
   options.add_argument('-t', '--tsv', dest='format', default='human', action='store_const',
     const='tsv',
     help='Print tab-delimited, computer-readable stats at the end instead of human optimized '
@@ -61,8 +69,13 @@ def main(argv):
 
   logging.basicConfig(stream=args.log, level=args.volume, format='%(message)s')
 
+  if args.processes < 1:
+    fail(f'--processes must be at least 1 (got {args.processes}).')
+
   if args.answer:
-    answers = [args.answer]
+    answers = [args.answer.lower()]
+    if not is_valid_word(answers[0]):
+      fail(f'Invalid --answer {args.answer!r}: must be only the letters a-z.')
   elif args.answers:
     answers = list(wordle.read_wordlist(args.answers))
     if len(answers) == 0:
@@ -71,43 +84,88 @@ def main(argv):
     fail('Must provide --answer or --answers.')
 
   word_len = len(answers[0])
-  words = wordle.read_wordlist(args.word_list, word_len)
-  logging.info(f'Read {len(words)} {word_len} letter words.')
+  guess1 = None
+  if args.guess1:
+    guess1 = args.guess1.lower()
+    if not is_valid_word(guess1):
+      fail(f'Invalid --guess1 {args.guess1!r}: must be only the letters a-z.')
+    if len(guess1) != word_len:
+      fail(f'--guess1 {args.guess1!r} must be {word_len} letters long, like the answers.')
   freqs = wordle.read_letter_freqs(args.letter_freqs)
+  words = wordle.WordList(wordle.read_wordlist(args.word_list, word_len), freqs, word_len)
+  logging.info(f'Read {len(words)} {word_len} letter words.')
   stats = wordle.read_word_stats(args.stats)
 
   if len(answers) == 1:
-    simulate_game(answers[0], words, freqs, stats, guess_thres=args.guess_thres, verbose=True)
+    simulate_game(
+      answers[0], words, freqs, stats, guess_thres=args.guess_thres, guess1=guess1, verbose=True
+    )
   else:
     rounds = collections.Counter()
+    total = 0
     start = last = time.perf_counter()
-    for answer_num, answer in enumerate(answers,1):
-      round = simulate_game(
-        answer, words, freqs, stats, guess_thres=args.guess_thres, guess1=args.guess1, verbose=False
+    worker_args = (words, freqs, stats, args.guess_thres, guess1)
+    if args.processes > 1:
+      executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=args.processes, initializer=init_worker, initargs=worker_args
       )
-      rounds[round] += 1
-      now = time.perf_counter()
-      if now - last > 60:
-        logging.error(f'On game {answer_num}')
-        last = now
+      results = executor.map(simulate_worker_game, answers, chunksize=32)
+    else:
+      executor = None
+      init_worker(*worker_args)
+      results = map(simulate_worker_game, answers)
+    try:
+      for answer_num, round in enumerate(results,1):
+        rounds[round] += 1
+        total += 1
+        now = time.perf_counter()
+        if now - last > 60:
+          logging.error(f'On game {answer_num}')
+          last = now
+    finally:
+      if executor:
+        # If a game raised, don't wait for the rest of the batch before reporting it.
+        executor.shutdown(cancel_futures=True)
     elapsed = time.perf_counter() - start
     logging.error(f'{len(answers)} games in {elapsed/60:0.1f} min')
-    total = sum(rounds.values())
     print('# '+' '.join(argv))
-    for round, count in sorted(rounds.items()):
+    for round in sorted(rounds):
+      count = rounds[round]
       if args.format == 'human':
         print(f'Round {round:2d}: {count} ({100*count/total:0.2f}%)')
       elif args.format == 'tsv':
         print(f'{round}\t{count}\t{100*count/total:0.2f}')
 
 
+# The data simulate_worker_game() needs, set up by init_worker() in each process.
+worker_state = {}
+
+
+def init_worker(words, freqs, stats, guess_thres, guess1):
+  worker_state['words'] = words
+  worker_state['freqs'] = freqs
+  worker_state['stats'] = stats
+  worker_state['guess_thres'] = guess_thres
+  worker_state['guess1'] = guess1
+  worker_state['cache'] = {}
+
+
+def simulate_worker_game(answer):
+  return simulate_game(
+    answer, worker_state['words'], worker_state['freqs'], worker_state['stats'],
+    guess_thres=worker_state['guess_thres'], guess1=worker_state['guess1'],
+    cache=worker_state['cache'], verbose=False
+  )
+
+
 def simulate_game(
-    answer, words, freqs, stats, guess_thres=None, guess1=None, max_rounds=None, verbose=False
+    answer, words, freqs, stats, guess_thres=None, guess1=None, max_rounds=None, cache=None,
+    verbose=False
   ):
   word_len = len(answer)
   fixed = [''] * word_len
-  present = [''] * word_len
-  absent = set()
+  present = [0] * word_len
+  absent = 0
   round = 1
   while True:
     if verbose:
@@ -115,20 +173,23 @@ def simulate_game(
     if guess1 and round == 1:
       guess = guess1
     else:
-      guess = wordle.choose_word(words, freqs, stats, fixed, present, absent, guess_thres)
+      guess = choose_word(words, freqs, stats, fixed, present, absent, guess_thres, cache=cache)
     if verbose:
       print(f'  Guessing {guess}')
     if guess == answer:
       if verbose:
         print('  Found it!')
       break
-    new_fixed, new_present, new_absent = simulate_round(answer, guess)
+    new_fixed, new_present, new_absent, feedback = simulate_round(answer, guess)
     if verbose:
-      feedback = format_feedback(guess, new_fixed, new_present, new_absent)
-      print(f'  Result:  {feedback}')
-    fixed = wordle.add_fixed(fixed, new_fixed)
-    present = wordle.add_present(present, new_present)
-    absent = absent | new_absent
+      print(f'  Result:  {format_feedback(feedback, word_len)}')
+    # Merge the new constraints into the running ones in place, rather than building new lists.
+    for i, letter in enumerate(new_fixed):
+      if letter:
+        fixed[i] = letter
+    for i, letters in enumerate(new_present):
+      present[i] |= letters
+    absent |= new_absent
     round += 1
     if max_rounds is not None and round > max_rounds:
       break
@@ -136,41 +197,95 @@ def simulate_game(
     return round
 
 
+def choose_word(words, freqs, stats, fixed, present, absent, guess_thres, cache=None):
+  """Call wordle.choose_word(), memoizing the result in `cache` (a dict), if given.
+  Many games pass through the same states, especially in the first couple rounds, so this saves
+  re-doing the same search over and over. The cache assumes `words`, `freqs`, and `stats` are the
+  same for every call."""
+  if cache is None:
+    return wordle.choose_word(words, freqs, stats, fixed, present, absent, guess_thres)
+  key = (tuple(fixed), tuple(present), absent, guess_thres)
+  try:
+    return cache[key]
+  except KeyError:
+    guess = cache[key] = wordle.choose_word(
+      words, freqs, stats, fixed, present, absent, guess_thres
+    )
+    return guess
+
+
 def simulate_round(answer, guess):
-  fixed = [''] * len(answer)
-  present = [''] * len(answer)
-  absent = set()
-  for i, letter in enumerate(guess):
-    if answer[i] == letter:
+  feedback = get_feedback(answer, guess)
+  fixed, present, absent = read_feedback(guess, feedback)
+  return fixed, present, absent, feedback
+
+
+def get_feedback(answer, guess):
+  """Score a guess the way Wordle does, giving one of ABSENT, PRESENT, or FIXED per position.
+  Greens are assigned first. Then each remaining letter of the guess is yellow only while there are
+  still unmatched copies of it in the answer, so guessing GLOSS for BOOST gives one green S and one
+  gray S. The results are returned packed into one integer (see unpack_feedback())."""
+  feedback = 0
+  # With only a handful of letters, a plain list is quicker to build and search than a Counter.
+  unmatched = []
+  misses = []
+  for i, (answer_letter, guess_letter) in enumerate(zip(answer, guess)):
+    if answer_letter == guess_letter:
+      feedback += FIXED * 3**i
+    else:
+      unmatched.append(answer_letter)
+      misses.append(i)
+  for i in misses:
+    letter = guess[i]
+    if letter in unmatched:
+      feedback += PRESENT * 3**i
+      unmatched.remove(letter)
+  return feedback
+
+
+@functools.lru_cache(maxsize=None)
+def unpack_feedback(feedback, word_len):
+  """Unpack feedback from get_feedback() into a bytes object with one result per position.
+  The packed form has one base-3 digit per position, with the first position as the least
+  significant digit."""
+  results = bytearray(word_len)
+  for i in range(word_len):
+    feedback, results[i] = divmod(feedback, 3)
+  return bytes(results)
+
+
+@functools.lru_cache(maxsize=None)
+def read_feedback(guess, feedback):
+  """Translate the feedback on a guess into (fixed, present, absent) constraints.
+  This only depends on the guess and the feedback, not the answer. And over a batch of games the
+  same guesses get the same few feedback patterns over and over, so the results are cached."""
+  results = unpack_feedback(feedback, len(guess))
+  found = 0
+  for letter, result in zip(guess, results):
+    if result != ABSENT:
+      found |= wordle.LETTER_BITS[letter]
+  fixed = [''] * len(guess)
+  present = [0] * len(guess)
+  absent = 0
+  for i, (letter, result) in enumerate(zip(guess, results)):
+    if result == FIXED:
       fixed[i] = letter
-    elif letter in answer:
-      #TODO: It looks like this isn't technically correct in all situations.
-      #      If your guess includes multiple of the same letter, and one is in the right position,
-      #      that will appear green (fixed), but the other will be gray, not yellow.
-      #      See the one from 2022-01-02 (BOOST) and guess GLOSS.
-      #      This probably doesn't affect the simulator, because its definition of "fixed",
-      #      "present", and "absent" is consistent. But would a human receive different information?
-      present[i] += letter
+    elif result == PRESENT or wordle.LETTER_BITS[letter] & found:
+      # A gray letter can still be in the answer, if it's a repeat and the answer's copies were
+      # already matched elsewhere. All that tells us is that it isn't in this position.
+      present[i] |= wordle.LETTER_BITS[letter]
     else:
-      absent.add(letter)
-  return fixed, present, absent
-
-
-def format_feedback(guess, fixed, present, absent):
-  feedback = [''] * len(fixed)
-  for i, letter in enumerate(fixed):
-    if letter:
-      feedback[i] = 'G'
-  for i, letters in enumerate(present):
-    for letter in letters:
-      if guess[i] == letter:
-        feedback[i] = 'Y'
-        break
-  for letter in absent:
-    for i, guess_letter in enumerate(guess):
-      if letter == guess_letter:
-        feedback[i] = '.'
-  return ''.join(feedback)
+      absent |= wordle.LETTER_BITS[letter]
+  return tuple(fixed), tuple(present), absent
+
+
+def format_feedback(feedback, word_len):
+  return ''.join([FEEDBACK_CHARS[result] for result in unpack_feedback(feedback, word_len)])
+
+
+def is_valid_word(word):
+  # The feedback code looks letters up in wordle.LETTER_BITS, so they have to be a-z.
+  return word.isascii() and word.isalpha() and word.islower()
 
 
 def fail(message):
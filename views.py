@@ -1,6 +1,9 @@
 # Builtins
+import contextlib
 import logging
+import os
 import pathlib
+import pickle
 # 3rd party
 from django.shortcuts import render
 from django.conf import settings
@@ -17,13 +20,67 @@ GUESSES_LENGTH = 15
 WORD_LIST_PATH = SCRIPT_DIR/'words.txt'
 FREQS_PATH = SCRIPT_DIR/'letter-freqs.all-answers.tsv'
 STATS_PATH = SCRIPT_DIR/'stats-ghent-plus.tsv'
-
-with WORD_LIST_PATH.open() as word_list_file:
-  WORDS = wordle.read_wordlist(word_list_file, WORD_LENGTH)
-with FREQS_PATH.open() as freqs_file:
-  FREQS = wordle.read_letter_freqs(freqs_file)
-with STATS_PATH.open() as stats_file:
-  STATS = wordle.read_word_stats(stats_file)
+# Where to cache the parsed data files (see load_data()). Set WORDLE_CACHE_DIR to None to turn the
+# cache off. By default it goes next to the data files.
+CACHE_DIR = getattr(settings, 'WORDLE_CACHE_DIR', SCRIPT_DIR)
+# The names of the green and yellow input fields for each position.
+LETTER_PARAMS = [(f'green{i}', f'yellow{i}') for i in range(1,WORD_LENGTH+1)]
+
+
+def load_data(src_path, parser, dependencies=()):
+  """Parse a data file with `parser`, caching the result in a pickle file in CACHE_DIR.
+  Unpickling is several times faster than parsing the text files, which matters since every worker
+  process does this on startup. The cache is rebuilt if it's older than the data file, the code
+  that parses it, or any other files listed in `dependencies`."""
+  if CACHE_DIR is None:
+    with src_path.open() as src_file:
+      return parser(src_file)
+  cache_path = pathlib.Path(CACHE_DIR)/src_path.with_suffix('.pkl').name
+  dependencies = (src_path, pathlib.Path(wordle.__file__), pathlib.Path(__file__), *dependencies)
+  try:
+    newest = max(path.stat().st_mtime for path in dependencies)
+    fresh = cache_path.stat().st_mtime > newest
+  except OSError:
+    fresh = False
+  if fresh:
+    try:
+      with cache_path.open('rb') as cache_file:
+        return pickle.load(cache_file)
+    except Exception as error:
+      # It's only a cache, so whatever went wrong (e.g. it was written under a different package
+      # name), fall back to parsing the data file.
+      log.warning(f'Failed to load cache file {cache_path}: {error}')
+  with src_path.open() as src_file:
+    data = parser(src_file)
+  if not os.access(cache_path.parent, os.W_OK):
+    # Probably a read-only deploy. That's expected, so don't warn about it on every worker start.
+    log.info(f'Not caching {src_path.name}: {cache_path.parent} is not writable.')
+    return data
+  # Write to a temp file first so other workers never see a partially-written cache.
+  tmp_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.tmp')
+  try:
+    with tmp_path.open('wb') as tmp_file:
+      pickle.dump(data, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+  except OSError as error:
+    log.warning(f'Failed to write cache file {cache_path}: {error}')
+    with contextlib.suppress(OSError):
+      tmp_path.unlink(missing_ok=True)
+  return data
+
+
+def read_words(word_list_file):
+  # Giving the WordList the letter frequencies lets it pre-sort the words by score.
+  words = wordle.WordList(wordle.read_wordlist(word_list_file, WORD_LENGTH), FREQS, WORD_LENGTH)
+  # Cache plain data instead of the WordList itself, so the pickle doesn't depend on module paths.
+  return words.get_state()
+
+
+FREQS = load_data(FREQS_PATH, wordle.read_letter_freqs)
+WORDS = wordle.WordList.from_state(
+  load_data(WORD_LIST_PATH, read_words, dependencies=(FREQS_PATH,))
+)
+STATS = load_data(STATS_PATH, wordle.read_word_stats)
 log.info(
   f'Read {len(WORDS)} {WORD_LENGTH} letter words, {len(FREQS)} letter frequencies, and statistics '
   f'on {len(STATS)} words.'
@@ -45,38 +102,40 @@ def guess(request):
 def get_guess_context(request):
   context = get_empty_context()
   params = QueryParams()
-  for i in range(1,WORD_LENGTH+1):
-    params.add(f'green{i}', type=lower_strip_whitespace)
-    params.add(f'yellow{i}', type=lower_strip_whitespace)
+  for green_param, yellow_param in LETTER_PARAMS:
+    params.add(green_param, type=lower_strip_whitespace)
+    params.add(yellow_param, type=lower_strip_whitespace)
   params.add('grays', type=lower_strip_whitespace)
   params.parse(request.POST)
   if params.invalid_value:
     return log_and_bundle_error(context, 'Invalid input.')
   fixed = []
   present = []
-  for i in range(1,WORD_LENGTH+1):
+  for green_param, yellow_param in LETTER_PARAMS:
     # Greens
-    letter = params[f'green{i}']
+    letter = params[green_param]
     if not (len(letter) == 1 or letter == ''):
       return log_and_bundle_error(
         context, f'Must provide one green letter per position. Received {letter!r} instead.'
       )
     fixed.append(letter)
     # Yellows
-    letters = params[f'yellow{i}']
+    letters = params[yellow_param]
     present.append(letters)
   # Grays
-  letters = params['grays']
-  absent = set(letters) - set(fixed) - {'.',''}
+  # Build the grays straight into a letter mask. Non-letters like '.' are dropped along the way.
+  absent = wordle.letters_to_mask(params['grays']) & ~wordle.letters_to_mask(fixed)
+  absent_str = wordle.mask_to_letters(absent)
   log.info(f'Got fixed letters   {fixed!r}')
   log.info(f'Got present letters {present!r}')
-  log.info(f'Got absent letters  {"".join(absent)!r}')
+  log.info(f'Got absent letters  {absent_str!r}')
   context['fixed'] = fixed
   context['present'] = present
-  context['absent'] = ''.join(absent)
+  context['absent'] = absent_str
   try:
     context['guesses'] = wordle.choose_words(
-      WORDS, FREQS, STATS, fixed, present, absent, GUESS_THRES, GUESSES_LENGTH
+      WORDS, FREQS, STATS, fixed, wordle.present_to_masks(present), absent, GUESS_THRES,
+      GUESSES_LENGTH
     )
     return context
   except wordle.WordleError as error:
@@ -101,4 +160,5 @@ def lower_strip_whitespace(raw_value):
   """Remove whitespace from the string (both internal and at the ends)."""
   if raw_value is None:
     return ''
-  return ''.join(raw_value.lower().strip().split())
+  # split() with no arguments already drops leading and trailing whitespace.
+  return ''.join(raw_value.lower().split())
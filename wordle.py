@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 import argparse
+import functools
+import heapq
+import itertools
 import logging
+import operator
 import pathlib
 import string
 import sys
@@ -13,6 +17,13 @@ DESCRIPTION = """How much can a simple script help solve wordles?
 This gives a list of the possible words that fit what you currently know based on your previous
 guesses."""
 EPILOG = 'Wordle: https://www.powerlanguage.co.uk/wordle/'
+# Sets of letters are encoded as 26-bit integers: bit 0 for 'a', bit 1 for 'b', etc.
+LETTER_BITS = {letter:1 << i for i, letter in enumerate(string.ascii_lowercase)}
+BIT_CHARS_TO_BYTES = bytes.maketrans(b'01', b'\x00\x01')
+# The characters that separate positions in the present argument (see parse_present()).
+PRESENT_SEPARATORS = frozenset('/|-')
+# WordList.select() picks out the words one at a time when returning at most this many.
+SPARSE_SELECT_MAX = 64
 
 
 def make_argparser():
@@ -77,14 +88,14 @@ def main(argv):
 
   fixed = parse_fixed(args.fixed, args.word_length)
   try:
-    present = parse_present(args.present, args.word_length)
+    present = present_to_masks(parse_present(args.present, args.word_length))
   except WordleError as error:
     fail(error.message)
-  absent = set(args.absent.lower()) - set(fixed) - {'.',''}
+  absent = letters_to_mask(set(args.absent.lower()) - set(fixed))
 
-  words = read_wordlist(args.word_list, args.word_length)
-  logging.info(f'Read {len(words)} {args.word_length} letter words.')
   freqs = read_letter_freqs(args.letter_freqs)
+  words = WordList(read_wordlist(args.word_list, args.word_length), freqs, args.word_length)
+  logging.info(f'Read {len(words)} {args.word_length} letter words.')
   stats = read_word_stats(args.stats)
 
   candidates = get_candidates(words, freqs, fixed, present, absent)
@@ -93,8 +104,10 @@ def main(argv):
   if result:
     guess, stat = result
     print(f'Guess: {guess} (score: {stat:0.2f})')
-  new_candidates = get_new_candidates(candidates, words, freqs, fixed, present, absent)
-  print('\n'.join(new_candidates[:args.limit]))
+  new_candidates = get_new_candidates(
+    candidates, words, freqs, fixed, present, absent, limit=args.limit
+  )
+  print('\n'.join(new_candidates))
 
 
 def parse_fixed(fixed_str, word_len):
@@ -115,31 +128,33 @@ def parse_present(present_str, word_len):
   places = [''] * word_len
   place = 1
   last_char = None
+  # Only build the debug messages if they'll actually be logged.
+  debug = logging.getLogger().isEnabledFor(logging.DEBUG)
   for char in present_str.lower():
-    debug_str = f'{char}: '
-    if char in '/|-':
+    if char in PRESENT_SEPARATORS:
       place += 1
-      debug_str += f'Incrementing place to {place}'
+      if debug:
+        logging.debug(f'{char}: Incrementing place to {place}')
     elif char == '.':
       if last_char is None:
         pass
-      elif last_char in '/|-':
+      elif last_char in PRESENT_SEPARATORS:
         raise WordleError(
           f'Invalid present string ({present_str!r}): Cannot have a {last_char!r} adjacent to a .',
         )
-      elif last_char in string.ascii_lowercase:
+      elif last_char in LETTER_BITS:
         # If the last character was a letter, increment it by an additional place.
-        debug_str += f'Incrementing place to {place}, then '
         place += 1
       place += 1
-      debug_str += f'Incrementing place to {place}'
+      if debug:
+        logging.debug(f'{char}: Incrementing place to {place}')
     else:
       if place > len(places):
         raise WordleError(f'Present string longer than word length ({place} > {word_len})')
       else:
         places[place-1] += char
-      debug_str += f'Storing at place {place}'
-    logging.debug(debug_str)
+      if debug:
+        logging.debug(f'{char}: Storing at place {place}')
     last_char = char
   return places
 
@@ -159,60 +174,97 @@ def add_fixed(fixed, fixed_addition):
 
 
 def add_present(present, present_addition):
-  new_present = present.copy()
   if len(present) != len(present_addition):
     raise WordleError(
       f'Present arrays have different lengths ({len(present)} != {len(present_addition)})'
     )
-  for i, new_letters in enumerate(present_addition):
-    old_letters = present[i]
-    new_present[i] = ''.join(set(new_letters) | set(old_letters))
-  return new_present
-
-
-def get_candidates(words, freqs, fixed, present, absent):
-  candidates = []
-  for word in words:
-    if is_candidate(word, fixed, present, absent):
-      candidates.append(word)
-  candidates.sort(key=lambda word: score_letter_freqs(word, freqs), reverse=True)
-  return candidates
+  return [old_letters | new_letters for old_letters, new_letters in zip(present, present_addition)]
+
+
+def get_candidates(words, freqs, fixed, present, absent, limit=None):
+  """Return the words which fit the constraints, best letter frequency score first.
+  If `limit` is given, only the top `limit` words are returned, which saves sorting all of them."""
+  matches = filter_words(words, tuple(fixed), tuple(present), absent)
+  if logging.getLogger().isEnabledFor(logging.DEBUG):
+    # The bitwise filtering above can't say why a word was excluded, so only when debugging, run
+    # each word through is_candidate() to log its reason. This way the messages are never even
+    # formatted otherwise.
+    for word in words:
+      is_candidate(word, fixed, present, absent, words.masks[word])
+  if words.freqs == freqs:
+    # The word list is already in score order.
+    return words.select(matches, limit)
+  candidates = words.select(matches)
+  key = lambda word: score_letter_freqs(word, freqs, words.masks[word])
+  if limit is None:
+    candidates.sort(key=key, reverse=True)
+    return candidates
+  else:
+    return heapq.nlargest(limit, candidates, key=key)
 
 
-def is_candidate(word, fixed, present, absent):
+@functools.lru_cache(maxsize=1024)
+def filter_words(words, fixed, present, absent):
+  """Return the set of words in the WordList `words` which fit the constraints, as a bit set.
+  The same constraints come up over and over (the first couple rounds of every game, repeated web
+  requests), so the results are cached. `fixed` and `present` must be tuples, to be hashable."""
+  # Narrow down the set of matching words one constraint at a time, using the word sets in `words`
+  # (see WordList). This gives the same result as calling is_candidate() on each word.
+  matches = words.all
+  for i, letter in enumerate(fixed):
+    if letter:
+      matches &= words.places[i].get(letter, 0)
+  for i, letters in enumerate(present):
+    for letter in mask_to_letters(letters):
+      # The letter has to be in the word, but not at this position.
+      matches &= words.letters.get(letter, 0) & ~words.places[i].get(letter, 0)
+  for letter in mask_to_letters(absent):
+    matches &= ~words.letters.get(letter, 0)
+  return matches
+
+
+def is_candidate(word, fixed, present, absent, word_mask=None):
+  """Check whether a single word fits the constraints, logging the reason at DEBUG level if not.
+  `word_mask` is the word's letters_to_mask(), if it's already been computed."""
+  if word_mask is None:
+    word_mask = letters_to_mask(word)
+  # Do the single-mask tests first: they're the cheapest, and they reject the most words.
+  # Exclude words with an "absent" character.
+  absent_letters = word_mask & absent
+  if absent_letters:
+    logging.debug(f'{word}: Has absent letter(s) {mask_to_letters(absent_letters)}')
+    return False
+  # Exclude words without a "present" character.
+  required = 0
+  for letters in present:
+    required |= letters
+  missing = required & ~word_mask
+  if missing:
+    logging.debug(f'{word}: Missing present letter(s) {mask_to_letters(missing)}')
+    return False
   # Exclude words without a "fixed" character in the right place.
   for i, letter in enumerate(fixed):
     if letter and word[i] != letter:
       logging.debug(f'{word}: Missing fixed letter {letter} at {i+1}')
       return False
+  # Exclude words with a "present" character in the place we know it isn't.
   for place, letters in enumerate(present,1):
-    # Exclude words without a "present" character.
-    for letter in letters:
-      if letter not in word:
-        logging.debug(f'{word}: Missing present letter {letter}')
-        return False
-    # Exclude words with a "present" character in the place we know it isn't.
-    if word[place-1] in letters:
-      logging.debug(f'{word}: Has present letter {letter} at excluded position ({place})')
-      return False
-  # Exclude words with an "absent" character.
-  for letter in absent:
-    if letter in word:
-      logging.debug(f'{word}: Has absent letter {letter}')
+    if LETTER_BITS.get(word[place-1], 0) & letters:
+      logging.debug(f'{word}: Has present letter {word[place-1]} at excluded position ({place})')
       return False
   return True
 
 
-def score_letter_freqs(word, freqs):
+def score_letter_freqs(word, freqs, word_mask=None):
+  """Score a word by how common its letters are at each position, penalizing repeated letters.
+  `word_mask` is the word's letters_to_mask(), if it's already been computed."""
+  if word_mask is None:
+    word_mask = letters_to_mask(word)
+  # Each distinct letter sets one bit, so any letters beyond that are repeats.
+  repeats = len(word) - word_mask.bit_count()
   score = 0
-  seen = set()
-  repeats = 0
   for place, letter in enumerate(word,1):
-    if letter in seen:
-      repeats += 1
-    seen.add(letter)
-    counts = freqs[letter]
-    score += counts[place]
+    score += freqs[letter][place]
   return score / (10**repeats)
 
 
@@ -223,18 +275,15 @@ def score_guesses(candidates, word_stats):
   candidate words. This is a weighted version of the naive case where each word has equal
   probability: the score for each word would be 1/N. That should be the actual probability that
   each word is correct. Instead here it's stat/sum_stats."""
-  stats = []
   raw_stats = [word_stats.get(word,0) for word in candidates]
   total = sum(raw_stats)
   if total == 0:
     return [0] * len(candidates)
-  for raw_stat in raw_stats:
-    stats.append(raw_stat/total)
-  return stats
+  return [raw_stat/total for raw_stat in raw_stats]
 
 
 def get_answer_guess(candidates, stats, thres):
-  guesses = get_answer_guesses(candidates, stats)
+  guesses = get_answer_guesses(candidates, stats, limit=1)
   if not guesses:
     return None
   word, stat = guesses[0]
@@ -244,17 +293,23 @@ def get_answer_guess(candidates, stats, thres):
     return None
 
 
-def get_answer_guesses(candidates, stats):
+def get_answer_guesses(candidates, stats, limit=None):
+  """Return (word, score) pairs for the candidates, highest score first.
+  If `limit` is given, only the top `limit` are returned, which saves sorting all of them."""
   weighted_stats = score_guesses(candidates, stats)
-  return sorted(zip(candidates, weighted_stats), key=lambda e: e[1], reverse=True)
+  if limit is None:
+    return sorted(zip(candidates, weighted_stats), key=operator.itemgetter(1), reverse=True)
+  else:
+    # nlargest() breaks ties the same way the stable sort does.
+    return heapq.nlargest(limit, zip(candidates, weighted_stats), key=operator.itemgetter(1))
 
 
 def choose_words(words, freqs, stats, fixed, present, absent, guess_thres, limit=None):
   guesses = {'choice':None}
   candidates = get_candidates(words, freqs, fixed, present, absent)
   # Make our best guess at the actual answer.
-  answer_guesses = get_answer_guesses(candidates, stats)
-  guesses['answers'] = answer_guesses[:limit]
+  answer_guesses = get_answer_guesses(candidates, stats, limit)
+  guesses['answers'] = answer_guesses
   if answer_guesses:
     answer_guess, stat = answer_guesses[0]
     if stat >= guess_thres:
@@ -262,8 +317,8 @@ def choose_words(words, freqs, stats, fixed, present, absent, guess_thres, limit
   if not candidates:
     raise WordleError('No words found which fit the constraints!')
   # If we're not trying to solve, guess new letters instead of ones we already know are right.
-  new_candidates = get_new_candidates(candidates, words, freqs, fixed, present, absent)
-  guesses['excluders'] = new_candidates[:limit]
+  new_candidates = get_new_candidates(candidates, words, freqs, fixed, present, absent, limit)
+  guesses['excluders'] = new_candidates
   if not guesses['choice']:
     if new_candidates:
       guesses['choice'] = new_candidates[0]
@@ -273,34 +328,68 @@ def choose_words(words, freqs, stats, fixed, present, absent, guess_thres, limit
 
 
 def choose_word(words, freqs, stats, fixed, present, absent, guess_thres):
-  results = choose_words(words, freqs, stats, fixed, present, absent, guess_thres)
+  results = choose_words(words, freqs, stats, fixed, present, absent, guess_thres, limit=1)
   return results['choice']
 
 
-def get_new_candidates(candidates, words, freqs, fixed, present, absent):
-  new_absent = absent.copy() | set(''.join(fixed)) | set(''.join(present))
-  new_fixed = new_present = ['']*len(fixed)
-  if new_fixed == fixed == new_present == present:
+def get_new_candidates(candidates, words, freqs, fixed, present, absent, limit=None):
+  new_absent = absent | letters_to_mask(''.join(fixed))
+  for letters in present:
+    new_absent |= letters
+  new_fixed = ['']*len(fixed)
+  new_present = [0]*len(present)
+  if new_fixed == fixed and new_present == present:
     # Everything's empty. It's our first guess so the new candidates would be the same as the old.
-    return candidates
+    return candidates[:limit]
   else:
-    return get_candidates(words, freqs, new_fixed, new_present, new_absent)
+    return get_candidates(words, freqs, new_fixed, new_present, new_absent, limit)
+
+
+def letters_to_mask(letters):
+  """Encode a collection of letters as a bitmask (see LETTER_BITS). Non-letters are ignored."""
+  mask = 0
+  for letter in letters:
+    mask |= LETTER_BITS.get(letter, 0)
+  return mask
+
+
+def present_to_masks(present):
+  """Encode each position's present letters with letters_to_mask().
+  Unlike for the absent letters, a non-letter here can't just be dropped: it'd silently loosen the
+  constraints. So raise a WordleError instead."""
+  masks = []
+  for letters in present:
+    for letter in letters:
+      if letter not in LETTER_BITS:
+        raise WordleError(f'Invalid present letter {letter!r}. Only the letters a-z are allowed.')
+    masks.append(letters_to_mask(letters))
+  return masks
+
+
+def mask_to_letters(mask):
+  """Decode a bitmask from letters_to_mask() into a string of its letters, in alphabetical order."""
+  # Only visit the set bits, peeling off the lowest one each time. Masks are usually sparse.
+  letters = []
+  while mask:
+    lowest_bit = mask & -mask
+    letters.append(string.ascii_lowercase[lowest_bit.bit_length()-1])
+    mask ^= lowest_bit
+  return ''.join(letters)
 
 
 def read_wordlist(word_file, wordlen=None):
+  """Read the valid words from the file, as a sorted tuple with duplicates removed."""
   words = set()
-  for fields in read_tsv(word_file, min_columns=1):
-    word = fields[0].lower()
+  # Only the first column is needed, so skip read_tsv() and splitting every line into a list.
+  for line in read_lines(word_file):
+    word = line.partition('\t')[0].lower()
     if wordlen is not None and len(word) != wordlen:
       continue
-    invalid = False
-    for letter in word:
-      if letter not in string.ascii_lowercase:
-        invalid = True
-    if invalid:
+    # The word's already lowercased, so this means it's all a-z (str methods run in C).
+    if not (word.isascii() and word.isalpha()):
       continue
     words.add(word)
-  return words
+  return tuple(sorted(words))
 
 
 def read_word_stats(stats_file):
@@ -322,15 +411,100 @@ def read_letter_freqs(freqs_file):
 
 
 def read_tsv(tsv_file, min_columns=None):
-  for line_raw in tsv_file:
-    fields = line_raw.rstrip('\r\n').split('\t')
-    if len(fields) > 0 and fields[0].startswith('#'):
-      continue
+  for line in read_lines(tsv_file):
+    fields = line.split('\t')
     if min_columns is not None and len(fields) < min_columns:
       raise WordleError(f'Too few columns ({len(fields)} < {min_columns})')
     yield fields
 
 
+def read_lines(text_file):
+  """Yield the file's lines without line endings, skipping comments (lines starting with '#')."""
+  # Read the whole file at once instead of line by line. These files are small enough to hold in
+  # memory, and it saves a little per-line overhead on the large stats file.
+  lines = text_file.read().split('\n')
+  if lines and lines[-1] == '':
+    lines.pop()
+  for line_raw in lines:
+    if line_raw.startswith('#'):
+      continue
+    yield line_raw.rstrip('\r')
+
+
+class WordList:
+  """A word list stored column-wise, so it can be filtered all at once instead of word by word.
+  Sets of words are represented as integers used as bit arrays: bit i is set if the set includes
+  self.words[i]. For each (0-based) position, self.places[position][letter] is the set of words with
+  that letter there, and self.letters[letter] is the set of words with the letter anywhere. Applying
+  a constraint to the whole list is then a single bitwise operation.
+  self.masks also holds the letters_to_mask() of each word, for scoring.
+  If `freqs` is given, the words are stored in order of their score_letter_freqs(), best first (and
+  alphabetically among ties). Then any subset comes out of select() already sorted.
+  `word_len` is the number of positions to index. Give it so self.places covers every position
+  a constraint can name, even if no words that long were loaded."""
+
+  def __init__(self, words, freqs=None, word_len=None):
+    self.freqs = freqs
+    self.masks = {word:letters_to_mask(word) for word in words}
+    self.words = tuple(sorted(words))
+    if freqs is not None:
+      self.words = tuple(sorted(
+        self.words, key=lambda word: score_letter_freqs(word, freqs, self.masks[word]), reverse=True
+      ))
+    self.all = (1 << len(self.words)) - 1
+    self.places = []
+    self.letters = {}
+    longest = max((len(word) for word in self.words), default=0)
+    if word_len is None or word_len < longest:
+      word_len = longest
+    for place in range(word_len):
+      # Lay out this position's letters in reverse, so the first word ends up in the lowest bit.
+      column = ''.join([word[place] if place < len(word) else ' ' for word in reversed(self.words)])
+      letter_sets = {}
+      for letter in set(column) - {' '}:
+        bits = {ord(char):'0' for char in set(column)}
+        bits[ord(letter)] = '1'
+        letter_sets[letter] = int(column.translate(bits), 2)
+        self.letters[letter] = self.letters.get(letter, 0) | letter_sets[letter]
+      self.places.append(letter_sets)
+
+  def select(self, matches, limit=None):
+    """Return the words in the set `matches`, in list order (only the first `limit`, if given)."""
+    count = matches.bit_count()
+    if limit is not None:
+      count = min(count, limit)
+    if count <= SPARSE_SELECT_MAX:
+      # When only a few words are wanted, it's quicker to pick out the set bits one by one than to
+      # scan the whole list. Peeling off the lowest bit each time keeps them in list order.
+      words = []
+      for i in range(count):
+        lowest_bit = matches & -matches
+        words.append(self.words[lowest_bit.bit_length()-1])
+        matches ^= lowest_bit
+      return words
+    # Turn the bits into a bytes object of 0s and 1s (lowest bit first), to use as the selectors for
+    # itertools.compress(). This way the whole scan over the word list happens in C.
+    selectors = bin(matches)[:1:-1].encode('ascii').translate(BIT_CHARS_TO_BYTES)
+    return list(itertools.islice(itertools.compress(self.words, selectors), limit))
+
+  def get_state(self):
+    """Return all the WordList's data as builtin types, to rebuild it later with from_state().
+    Unlike pickling the WordList itself, this doesn't tie the data to the class's import path."""
+    return dict(vars(self))
+
+  @classmethod
+  def from_state(cls, state):
+    word_list = cls.__new__(cls)
+    word_list.__dict__.update(state)
+    return word_list
+
+  def __len__(self):
+    return len(self.words)
+
+  def __iter__(self):
+    return iter(self.words)
+
+
 class WordleError(Exception):
   def __init__(self, message, data=None):
     super().__init__(message)